@@ -1,45 +1,141 @@
 import asyncio
+import contextvars
+import functools
 import inspect
+import sys
 
 from dotenv import load_dotenv
 
 from backends.google_adk import get_backend
 
+# Bounded: per-call lambdas are hashed by identity and would otherwise be kept alive forever
+@functools.lru_cache(maxsize=1024)
+def _signature_keys(func) -> frozenset:
+    return frozenset(inspect.signature(func).parameters)
+
 def accepted_keys(func):
-    return set(inspect.signature(func).parameters.keys()) if callable(func) else set()
+    if not callable(func):
+        return frozenset()
+    try:
+        return _signature_keys(func)
+    except TypeError:  # Unhashable callable, inspect it every time
+        return frozenset(inspect.signature(func).parameters)
 
-def safe_lambda(lmbda, keys, **kwargs):
-    if 'kwargs' in keys:
-        accepted_args = {k: v for k, v in kwargs.items()}  # all
-    else:
-        accepted_args = {k: v for k, v in kwargs.items() if k in keys}
+def bind_keys(func):
+    """Calls func with the kwargs it accepts, missing ones as None. The keys are resolved once, not per call."""
+    keys = accepted_keys(func)
+    if 'kwargs' in keys:  # Accepts everything, only fill in the missing names
+        names = tuple(k for k in keys if k != 'kwargs')
+
+        def call(*args, **kwargs):
+            for name in names:
+                kwargs.setdefault(name, None)
+            return func(*args, **kwargs)
+        return call
+
+    # Straight-line call for the fixed keys: func(*args, a=get('a'), b=get('b'))
+    arguments = ''.join(f', {name}=get({name!r})' for name in sorted(keys))
+    namespace = {'func': func}
+    exec(f"def call(*args, **kwargs):\n"
+         f"    get = kwargs.get\n"
+         f"    return func(*args{arguments})\n", namespace)
+    return namespace['call']
+
+def renderer(template):
+    """Decides once how a template is rendered, so calls do not re-check callable()."""
+    if not callable(template):
+        def constant(*args, **kwargs):
+            return template
+        return constant
+    return bind_keys(template)
 
-    missing_args = keys - set(accepted_args.keys())
-    missing_args = {k: None for k in missing_args}
-    all_args = accepted_args | missing_args
-    return lmbda(**all_args)
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit running fn in a copy of the caller's context, so context variables follow the call."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+load_dotenv()
+
+_event_loop = None
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    try:
+        import uvloop  # Optional, cheaper task scheduling and socket I/O when installed
+    except ImportError:
+        return asyncio.new_event_loop()
+    return uvloop.new_event_loop()
+
+def run_async(coro):
+    """Run a coroutine on one event loop shared by tests and example entry points."""
+    global _event_loop
+    if _event_loop is None:
+        _event_loop = new_event_loop()
+    return _event_loop.run_until_complete(coro)
 
 def llm_test(call, *args, **kwargs):
-    load_dotenv()
     print(call(*args, **kwargs))
 
+def async_llm_test(call, *args, **kwargs):
+    run_async(get_backend().create_session())
+    # Outside the loop: agents built at call time create their sessions with asyncio.run
+    print(call(*args, **kwargs))
+
+_turn_buffer = contextvars.ContextVar('fai_turn_buffer', default=None)  # Per thread and task
+
+class TurnBuffer:
+    """Collects everything the print_* helpers emit and writes it once on exit.
+    with TurnBuffer():
+        print_llm_blue(paragraph)
+        print_dash()
+    """
+
+    def __init__(self):
+        self.parts = []
+        self._token = None
+
+    def __enter__(self):
+        self._token = _turn_buffer.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _turn_buffer.reset(self._token)
+        outer = _turn_buffer.get()
+        if outer is not None:  # Nested: keep the order by handing the output to the enclosing buffer
+            outer.parts.extend(self.parts)
+            return
+        sys.stdout.write(''.join(self.parts))
+        sys.stdout.flush()
+
+_GREEN = '\033[92m'
+_RED = '\033[91m'
+_YELLOW = '\033[93m'
+_BLUE = '\033[94m'
+_RESET = '\033[0m\n'
+
+def _emit(text, color: str = ''):
+    line = f"{color}{text}{_RESET}" if color else f"{text}\n"
+    buffer = _turn_buffer.get()
+    if buffer is not None:
+        buffer.parts.append(line)
+    else:
+        sys.stdout.write(line)
+
 def print_success_green(text):
-    print(f"\033[92m{text}\033[0m")
+    _emit(text, _GREEN)
 
 def print_error_red(text):
-    print(f"\033[91m{text}\033[0m")
+    _emit(text, _RED)
 
 def print_debug_yellow(text):
-    print(f"\033[93m{text}\033[0m")
+    _emit(text, _YELLOW)
 
 def print_llm_blue(text):
-    print(f"\033[94m{text}\033[0m")
+    _emit(text, _BLUE)
 
 def print_user_default(text):
-    print(text)
+    _emit(text)
 
 def print_dash(char: str = '-', count: int = 80):
-    print(char * count)
+    _emit(char * count)
 
 def template_history(history: list[str]) -> str:
     conversation_history = ""
@@ -1,8 +1,14 @@
 import asyncio
+import functools
+import inspect
+import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 
 from google.adk import Runner
 from google.adk.agents import LlmAgent
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.events import Event
 from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService, Session
@@ -15,6 +21,24 @@ MODEL_DEEPSEEK_CHAT = "deepseek/deepseek-chat"
 APP_NAME = "fun_ai"
 USER_ID = "12345"
 
+DEBUG = bool(os.getenv('FAI_DEBUG'))  # Print tool calls and responses as they happen
+
+@functools.cache
+def get_llm(model: str) -> LiteLlm:
+    # One client per model string, shared by every runner using that model
+    return LiteLlm(model=model)
+
+def threaded(tool):
+    """Async wrapper for a sync tool, so ADK can overlap it with the other calls of the same turn."""
+    if not inspect.isfunction(tool) or inspect.iscoroutinefunction(tool):
+        return tool
+
+    @functools.wraps(tool)  # Keeps the name, docstring and signature ADK declares to the model
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(tool, *args, **kwargs)
+
+    return wrapper
+
 def print_debug(text):
     print(f"\033[93m{text}\033[0m")
 
@@ -23,15 +47,35 @@ class GoogleAdkBackend:
         self.session_service = InMemorySessionService()
         self.session = None
 
-    def create_runner(self, llm: str = None, tools=None, schema=None):
+    def create_runner(self, llm: str = None, tools=None, schema=None, parallel_tools: bool = False):
+        session = self.new_session()
+
+        # Sessions hold the conversation, so each caller gets its own,
+        # but the agent graph and its LiteLlm client are shared
+        agent, runner = self._build_runner(llm, tuple(tools or ()), schema, parallel_tools)
+        return agent, runner, session
+
+    def new_session(self) -> Session:
         session_id = str(uuid.uuid4())
+        create = functools.partial(
+            self.session_service.create_session, app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(create())
 
-        session = asyncio.run(
-            self.session_service.create_session(
-                app_name=APP_NAME, user_id=USER_ID, session_id=session_id))
+        # Called from a coroutine (async entry points): that loop is busy, create the session on its own
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(lambda: asyncio.run(create())).result()
+
+    # Keyed on the tool and schema objects themselves, so distinct configs never alias
+    @functools.lru_cache(maxsize=256)
+    def _build_runner(self, llm: str, tools: tuple, schema, parallel_tools: bool):
+        if parallel_tools:  # Function calls from one model response run concurrently
+            tools = tuple(threaded(tool) for tool in tools)
 
         agent = LlmAgent(
-            model=LiteLlm(model=llm),
+            model=get_llm(llm),
             name="functional_ai_agent",
             instruction="You are a helpful assistant",
             description="An agent that performs tasks based on instructions",
@@ -39,17 +83,20 @@ class GoogleAdkBackend:
             output_key="result",
             disallow_transfer_to_parent=True,
             disallow_transfer_to_peers=True,
-            tools=tools)
+            tools=list(tools))
 
         runner = Runner(
             agent=agent,
             app_name=APP_NAME,
             session_service=self.session_service)
 
-        return agent, runner, session
+        return agent, runner
 
     @staticmethod
     def print_event(event: Event):
+        if not DEBUG or not event.content or not event.content.parts:
+            return
+
         for part in event.content.parts:
             if part.function_call is not None:
                 print_debug(f'Tool call >>> {part.function_call.name}({part.function_call.args})')
@@ -58,8 +105,15 @@ class GoogleAdkBackend:
             elif part.text is not None:
                 print_debug(f'LLM text >>> {part.text[:100]}...')
 
-    @staticmethod
-    def call_agent(query: str, runner, session: Session) -> str:
+    async def create_session(self) -> Session:
+        # Default session for callers that do not bring their own, created once
+        if self.session is None:
+            self.session = await self.session_service.create_session(
+                app_name=APP_NAME, user_id=USER_ID, session_id=str(uuid.uuid4()))
+        return self.session
+
+    def call_agent(self, query: str, runner, session: Session = None) -> str:
+        session = session or self.session
         content = types.Content(role='user', parts=[types.Part(text=query)])
         for event in runner.run(user_id=USER_ID, session_id=session.id, new_message=content):
             GoogleAdkBackend.print_event(event)
@@ -72,7 +126,59 @@ class GoogleAdkBackend:
 
         raise RuntimeError("No final response received from the agent.")
 
-backend = GoogleAdkBackend()  # Create a singleton instance of the backend
+    def call_agent_batch(self, queries: list[str], runner, max_concurrency: int = None) -> list[str]:
+        # Every query gets a fresh session so the prompts do not see each other
+        sessions = [self.new_session() for _ in queries]
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            return list(executor.map(self.call_agent, queries, [runner] * len(queries), sessions))
+
+    @staticmethod
+    async def stream_agent(query: str, runner, session: Session):
+        content = types.Content(role='user', parts=[types.Part(text=query)])
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+        streamed = False
+        async for event in runner.run_async(user_id=USER_ID, session_id=session.id,
+                                            new_message=content, run_config=run_config):
+            if event.partial:  # Token deltas, the final event repeats the full text
+                if event.content and event.content.parts and event.content.parts[0].text:
+                    streamed = True
+                    yield event.content.parts[0].text
+                continue
+
+            GoogleAdkBackend.print_event(event)
+            if event.is_final_response():
+                if event.content and event.content.parts:
+                    if not streamed:
+                        yield event.content.parts[0].text
+                    return
+                elif event.actions and event.actions.escalate:
+                    raise RuntimeError(f"Agent escalated: {event.error_message or 'No specific message.'}")
+                break
 
+        raise RuntimeError("No final response received from the agent.")
+
+@functools.cache
 def get_backend():
-    return backend
+    return GoogleAdkBackend()  # Created lazily on first use, then shared
+
+def test_stream_agent():
+    def event(text, partial=False, final=False):
+        content = SimpleNamespace(parts=[SimpleNamespace(text=text, function_call=None, function_response=None)])
+        return SimpleNamespace(partial=partial, content=content, actions=None, is_final_response=lambda: final)
+
+    class StubRunner:
+        def __init__(self, events):
+            self.events = events
+
+        async def run_async(self, **kwargs):
+            for e in self.events:
+                yield e
+
+    async def collect(events):
+        stream = GoogleAdkBackend.stream_agent("query", StubRunner(events), SimpleNamespace(id="session"))
+        return [chunk async for chunk in stream]
+
+    deltas = [event("Hel", partial=True), event("lo", partial=True), event("Hello", final=True)]
+    assert asyncio.run(collect(deltas)) == ["Hel", "lo"], "The final event repeats the deltas and is skipped"
+    assert asyncio.run(collect([event("Hello", final=True)])) == ["Hello"], \
+        "Without deltas the final text is yielded whole"
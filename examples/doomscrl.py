@@ -1,11 +1,14 @@
 import asyncio
+import functools
+import itertools
 import os
+import stat
 
 from dotenv import load_dotenv
 from wikipedia import wikipedia
 
 import operators as fai
-from auxiliary import async_llm_test
+from auxiliary import async_llm_test, run_async
 
 from backends.google_adk import get_backend
 
@@ -31,11 +34,8 @@ def list_files(directory: str) -> dict:
     if not os.path.exists(directory):
         return {'status': 'error', 'output': f'Directory {directory} does not exist.'}
 
-    command = f"ls -la {directory}"
-
     try:
-        output = os.popen(command).read()
-        return {'status': 'success', 'output': output}
+        return {'status': 'success', 'output': list_dir(directory)}
     except Exception as e:
         return {'status': 'error', 'output': str(e)}
 
@@ -59,19 +59,15 @@ def cat_file(file_path: str, page: int) -> dict:
         return {'status': 'error', 'output': f'File {file_path} does not exist.'}
 
     try:
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
-            start = page * 250
-            end = start + 250
-
-            if start >= len(lines):
-                return {'status': 'error', 'output': 'End of file reached.'}
-
-            content = ''.join(lines[start:end])
-            return {'status': 'success', 'output': content}
+        content = read_page(file_path, page)
     except Exception as e:
         return {'status': 'error', 'output': str(e)}
 
+    if not content:
+        return {'status': 'error', 'output': 'End of file reached.'}
+
+    return {'status': 'success', 'output': content}
+
 def query_wiki(query: str) -> dict:
     """Query Wikipedia for a given term.
     * Args:
@@ -85,15 +81,55 @@ def query_wiki(query: str) -> dict:
     print(f'--- Tool: query_wiki called for {query} ---')
 
     try:
-        summary = wikipedia.summary(query, sentences=3)
+        summary = wiki_summary(query)
         return {'status': 'success', 'output': summary}
     except Exception as e:
         return {'status': 'error', 'output': str(e)}
 
+async def aquery_wiki(query: str) -> dict:
+    """Query Wikipedia for a given term.
+    * Args:
+        query (str): The term to search for on Wikipedia.
+    * Returns:
+        dict: A dictionary with status and output.
+            - 'status': 'success' or 'error'
+            - 'output': The summary of the Wikipedia page or an error message.
+    """
+
+    print(f'--- Tool: aquery_wiki called for {query} ---')
+
+    try:  # The HTTP request runs on a worker thread, the event loop keeps going
+        summary = await asyncio.to_thread(wiki_summary, query)
+        return {'status': 'success', 'output': summary}
+    except Exception as e:
+        return {'status': 'error', 'output': str(e)}
+
+# The agents revisit the same directories, pages and terms across turns and critic
+# iterations; the DOOM sources do not change while running, so results are memoized.
+# Failures raise and are therefore never cached.
+
+@functools.lru_cache(maxsize=256)
+def list_dir(directory: str) -> str:
+    with os.scandir(directory) as it:
+        entries = sorted((e.name, e.stat(follow_symlinks=False)) for e in it)
+    return '\n'.join(f'{stat.filemode(st.st_mode)} {st.st_size:>10} {name}' for name, st in entries)
+
+@functools.lru_cache(maxsize=256)
+def read_page(file_path: str, page: int) -> str:
+    with open(file_path, 'r') as file:
+        start = page * 250
+        return ''.join(itertools.islice(file, start, start + 250))  # Reads only up to the requested page
+
+@functools.lru_cache(maxsize=256)
+def wiki_summary(query: str) -> str:
+    return wikipedia.summary(query, sentences=3)
+
 # -------------- Prompts --------------------
 
+DASH = '-' * 80 + '\n'
+
 def wrap(string: str) -> str:
-    return f'\n{string}\n' + '-' * 80 + '\n'
+    return f'\n{string}\n{DASH}'
 
 def context_collector_template(request):
     return (
@@ -156,21 +192,21 @@ context_collector = fai.ai_agent(
     key="context")
 
 context_critic = fai.loopn(
-    lambda context: f"Keep only code, lines & files: {wrap(context)}",
-        fai.ai_agent(context_critic_template, tools=[list_files, cat_file], key="context"),
-        count=MAX_CTX_ITERATIONS,
-    key="context")
+    fai.ai_agent(context_critic_template, tools=[list_files, cat_file], key="context"),
+    count=MAX_CTX_ITERATIONS,
+    key="context")  # Every pass refines the previous one, the last is kept
 
 context_full = fai.cache(
     fai.sequential(
-        agents=[context_collector, context_critic]),
+        agents=[context_collector, context_critic],
+        reducer=lambda context: context),
     key="context")
 
-uml_chart = fai.transform(uml_chart_template, context_full, key="uml")
-pseudocode = fai.transform(pseudocode_template, context_full, key="pseudo")
+uml_chart = fai.ai_transform(uml_chart_template, context_full, key="uml")
+pseudocode = fai.ai_transform(pseudocode_template, context_full, key="pseudo")
 
-user_reply = fai.parallel(
-    user_reply_template, agents=[context_full, uml_chart, pseudocode])
+user_reply = fai.ai_parallel(
+    user_reply_template, agents=[context_full, uml_chart, pseudocode], tools=[aquery_wiki])
 
 # -------------------- Tests --------------------
 
@@ -201,4 +237,4 @@ if __name__ == '__main__':
 
             print(user_reply(request=request))
 
-    asyncio.run(run_agent())
+    run_async(run_agent())
@@ -1,11 +1,14 @@
-import asyncio
 import os
+from typing import Iterator
 
 import operators as fai
-from auxiliary import print_debug_yellow, print_llm_blue, print_success_green, async_llm_test, print_dash
+from auxiliary import print_debug_yellow, print_llm_blue, print_success_green, async_llm_test, print_dash, run_async, \
+    TurnBuffer
 from backends.google_adk import get_backend, MODEL_GPT_4O_MINI
 from operators import Agent
 
+MAX_CONCURRENCY = 10  # Detail reports in flight at once, keeps us under provider rate limits
+
 # --------------- Tools ---------------
 
 def load_profile() -> str:
@@ -151,18 +154,19 @@ User's Response:\n\n{response}
 # --------------- Universe ---------------
 
 universe = fai.cache(fai.ai_agent(template="Create a setting for a Sci-Fi universe"))
-universe_details = fai.transform(universe_details_template, agent=universe)
-
-def universe_details_mapper(it: str) -> list[Agent]:
-    details = it.splitlines()
+universe_details = fai.ai_transform(universe_details_template, agent=universe)
 
-    prompts = [universe_detail_report_template(detail)
-               for detail in details if detail.strip()]
+def universe_details_mapper(it: str) -> Iterator[Agent]:
+    # Lazy: fork submits each report as soon as its agent is built, no intermediate lists
+    prompts = (universe_detail_report_template(detail)
+               for detail in it.splitlines() if detail.strip())
 
-    return [fai.catch(
-                agent=fai.ai_agent(template=prompt),
+    # Transient errors (e.g. 429s) are retried with backoff on the same model before
+    # falling back; the fork pool bounds how many of these are in flight at once
+    return (fai.catch(
+                agent=fai.retry(fai.ai_agent(template=prompt)),
                 exception=fai.ai_agent(template=prompt, llm=MODEL_GPT_4O_MINI))
-            for prompt in prompts]
+            for prompt in prompts)
 
 def universe_full_reducer(it: list[str]) -> str:
     prompt = universe_full_report_template(it)
@@ -171,20 +175,24 @@ def universe_full_reducer(it: list[str]) -> str:
 setting = fai.store(fai.fork(
     agent=universe_details,
     mapper=universe_details_mapper,
-    reducer=universe_full_reducer), key="sett", filename=".setting")
+    reducer=universe_full_reducer,
+    max_concurrency=MAX_CONCURRENCY), key="sett", filename=".setting")
 
 # --------------- Story ---------------
 
 story = fai.store(
-    fai.transform(story_prompt_template, agent=setting), filename=".story")
-story_paragraph = fai.transform(story_paragraph_template, agent=story)
+    fai.ai_transform(story_prompt_template, agent=setting), filename=".story")
+story_paragraph = fai.ai_transform(story_paragraph_template, agent=story)
 
+# Both are refreshed once per paragraph, repeated calls within a turn hit the cache
 practice_rule = fai.cache(
-    fai.ai_agent(practice_rule_template, tools=[load_profile]), key="rule")
+    fai.ai_agent(practice_rule_template, tools=[load_profile]), key="rule",
+    version=lambda paragraph_no: paragraph_no)
 
 task_provider = fai.cache(
     fai.ai_parallel(
-        task_provider_template, agents=[setting, practice_rule]), key="task")
+        task_provider_template, agents=[setting, practice_rule]), key="task",
+    version=lambda paragraph_no: paragraph_no)
 
 response_examiner = fai.ai_parallel(
     response_examiner_template,
@@ -225,28 +233,28 @@ if __name__ == '__main__':
             if story_end in paragraph:
                 print("The story has ended.")
                 break
-            print_llm_blue(paragraph)
-            print_dash()
-
-            rule = practice_rule()
-            print_debug_yellow(rule)
-            print_dash()
-
-            task = task_provider()
-            print_debug_yellow(task)
-            print_dash()
+            with TurnBuffer():
+                print_llm_blue(paragraph)
+                print_dash()
+
+            rule = practice_rule(paragraph_no=paragraph_no)
+            task = task_provider(paragraph_no=paragraph_no)
+            with TurnBuffer():
+                print_debug_yellow(rule)
+                print_dash()
+                print_debug_yellow(task)
+                print_dash()
 
             user_response = input()
             if user_response.lower() in ['exit', 'quit']:
                 print("Exiting the agent.")
                 break
 
-            feedback = response_examiner(response=user_response)
-            print_success_green(feedback)
-            print_dash()
+            feedback = response_examiner(response=user_response, paragraph_no=paragraph_no)
+            with TurnBuffer():
+                print_success_green(feedback)
+                print_dash()
 
             paragraph_no += 1
-            practice_rule.clear()
-            task_provider.clear()
 
-    asyncio.run(run_agent())
+    run_async(run_agent())
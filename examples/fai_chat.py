@@ -1,3 +1,4 @@
+import itertools
 import os
 from typing import List
 
@@ -7,10 +8,12 @@ import operators as fai
 from auxiliary import print_success_green, print_llm_blue
 from prompts import PromptBuilder
 
-file_list_operators = os.listdir('../operators')
-file_list_operators = [f for f in file_list_operators if not f.startswith('.') and not os.path.isdir(f)]
-file_list_backends = os.listdir('../backends')
-file_list_backends = [f for f in file_list_backends if not f.startswith('.') and not os.path.isdir(f)]
+def list_source_files(directory: str) -> list[str]:
+    with os.scandir(directory) as it:  # DirEntry.is_dir() reuses the d_type from the listing
+        return [e.name for e in it if not e.name.startswith('.') and not e.is_dir()]
+
+file_list_operators = ', '.join(list_source_files('../operators'))
+file_list_backends = ', '.join(list_source_files('../backends'))
 
 # ---------- Tool Functions ---------
 
@@ -32,15 +35,14 @@ def cat_file(file_path: str, page: int) -> dict:
         return {'status': 'error', 'output': f'File {file_path} does not exist.'}
 
     try:
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
+        with open(file_path, 'r', buffering=65536) as file:
             start = page * 250
             end = start + 250
+            content = ''.join(itertools.islice(file, start, end))
 
-            if start >= len(lines):
+            if not content:
                 return {'status': 'error', 'output': 'End of file reached.'}
 
-            content = ''.join(lines[start:end])
             return {'status': 'success', 'output': content}
     except Exception as e:
         return {'status': 'error', 'output': str(e)}
@@ -63,29 +65,29 @@ def query_wiki(query: str) -> dict:
 
 # --------- Agent ---------
 
+# Prompts are laid out from most to least stable so the provider's prefix cache
+# (automatic for OpenAI) covers as much as possible: the shared prefix, then what is
+# fixed per sub-agent, then the chat which only grows, and last what changes every turn
+agent_prompt_prefix = (PromptBuilder()
+                       .file('static/agent_prompt').dash()
+                       .text("Available files in ../operators").tab()
+                       .text(file_list_operators).back().dash()
+                       .text("Available backends in ../backends").tab()
+                       .text(file_list_backends).back().dash())
+
 def sub_agent_template(question: str, chat_history: List[str]) -> str:
-    return (PromptBuilder()
-            .file('static/agent_prompt').dash()
-            .text("Available files in ../operators").tab()
-            .text(', '.join(file_list_operators)).back().dash()
-            .text("Available backends in ../backends").tab()
-            .text(', '.join(file_list_backends)).back().dash()
-            .chat(chat_history).dash()
+    return (agent_prompt_prefix.clone()
             .text(f"Question: {question}").dash()
+            .chat(chat_history)
             .prompt)
 
 def main_agent_template(chat_history: List[str],
                         file_agent: str, backend_agent: str, general_agent: str) -> str:
-    return (PromptBuilder()
-            .file('static/agent_prompt').dash()
-            .text("Available files in ../operators").tab()
-            .text(', '.join(file_list_operators)).back().dash()
-            .text("Available backends in ../backends").tab()
-            .text(', '.join(file_list_backends)).back().dash()
+    return (agent_prompt_prefix.clone()
+            .chat(chat_history).dash()
             .text(f"File agent response:\n{file_agent}").dash()
             .text(f"Backend agent response:\n{backend_agent}").dash()
-            .text(f"General agent response:\n{general_agent}").dash()
-            .chat(chat_history)
+            .text(f"General agent response:\n{general_agent}")
             .prompt)
 
 def create_sub_agent(question: str, key: str) -> fai.Agent:
@@ -93,6 +95,7 @@ def create_sub_agent(question: str, key: str) -> fai.Agent:
         fai.ai_agent(   # Create a Re-Act style AI agent with tools
             template=lambda chat_history: sub_agent_template(question, chat_history),
             tools=[cat_file, query_wiki],  # Each subagent can have own tools
+            parallel_tools=True,  # Disk and Wikipedia lookups from one response run on threads together
             key=key))
 
 fai_agent = fai.ai_parallel(        # Run parallel research with multiple agents
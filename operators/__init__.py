@@ -1,6 +1,7 @@
 from .agent import Agent, simple_agent
+from . import reducers
 
-from .cache import cache
+from .cache import cache, semantic_cache
 from .cache import store
 
 from .switch import switch
@@ -12,6 +13,7 @@ from .parallel import parallel, ai_parallel
 from .fork import fork
 
 from .agent import ai_agent
+from .batch import ai_batch
 from .transform import transform, ai_transform, ai_summarize
 from .extract import extract
 
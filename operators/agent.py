@@ -1,27 +1,50 @@
+import asyncio
+import threading
+import weakref
+
 from dotenv import load_dotenv
 
-from auxiliary import accepted_keys, safe_lambda
+from auxiliary import accepted_keys, renderer
 from auxiliary import llm_test
 from backends.google_adk import get_backend, MODEL_GPT_4O
+from operators.target import coalesced
 
 load_dotenv()
 
 class Agent:
+    __slots__ = ('_key', '__weakref__')
+
     def __init__(self, key: str = None):
         self._key = key
 
     def __call__(self, *args, **kwargs):
         raise NotImplementedError("This method should be overridden in subclasses.")
 
+    async def acall(self, *args, **kwargs):
+        # Operators are synchronous, run them on a worker thread to keep the loop free
+        return await asyncio.to_thread(self, *args, **kwargs)
+
     @property
     def key(self):
         return self._key if self._key is not None else 'it'
 
+    @property
+    def requires(self):
+        # Names read from kwargs, None when unknown: schedulers must then assume it reads everything
+        return None
+
+def template_requires(template):
+    keys = accepted_keys(template)
+    return None if 'kwargs' in keys else keys
+
 class LlmAgent(Agent):
-    def __init__(self, template, llm: str = None, tools=None, schema=None, key: str = None):
+    __slots__ = ('_template', '_render', 'agent', 'runner', 'session')
+
+    def __init__(self, template, llm: str = None, tools=None, schema=None, key: str = None,
+                 parallel_tools: bool = False):
         super().__init__(key=key)
         self._template = template
-        self._template_keys = accepted_keys(template)
+        self._render = renderer(template)
 
         if llm is None:
             llm = MODEL_GPT_4O
@@ -29,32 +52,62 @@ class LlmAgent(Agent):
         if tools is None:
             tools = []
 
-        self.agent, self.runner, self.session = get_backend().create_runner(llm, tools, schema)
+        self.agent, self.runner, self.session = get_backend().create_runner(llm, tools, schema, parallel_tools)
 
     def __call__(self, *args, **kwargs):
-        prompt = self._template
+        prompt = self._prompt(**kwargs)
+        # Concurrent identical calls on this agent (one object in several branches, interned agents)
+        # share one request instead of racing on the session
+        return coalesced((id(self.runner), self.session.id, prompt),
+                         lambda: get_backend().call_agent(prompt, self.runner, self.session))
 
-        if callable(self._template):
-            prompt = safe_lambda(self._template, self._template_keys, **kwargs)
+    def stream(self, *args, **kwargs):
+        """Async generator of response chunks: async for chunk in agent.stream(...)"""
+        return get_backend().stream_agent(self._prompt(**kwargs), self.runner, self.session)
 
-        return get_backend().call_agent(prompt, self.runner, self.session)
+    def _prompt(self, **kwargs):
+        return self._render(**kwargs)
 
-def simple_agent(call, key=None):
-    class SimpleAgent(Agent):
-        def __init__(self):
-            super().__init__(key=key)
-            self.call = call
-            self.call_keys = accepted_keys(call)
+    @property
+    def requires(self):
+        return template_requires(self._template)
+
+class SimpleAgent(Agent):
+    __slots__ = ('call', '_render')
 
-        def __call__(self, *args, **kwargs):
-            if callable(self.call):
-                return safe_lambda(self.call, self.call_keys, **kwargs)
-            return call
+    def __init__(self, call, key: str = None):
+        super().__init__(key=key)
+        self.call = call
+        self._render = renderer(call)
 
-    return SimpleAgent()
+    def __call__(self, *args, **kwargs):
+        return self._render(**kwargs)
 
-def ai_agent(template, llm: str = None, tools: list = None, key: str = None):
-    return LlmAgent(template=template, llm=llm, tools=tools, key=key)
+    @property
+    def requires(self):
+        return template_requires(self.call)
+
+def simple_agent(call, key=None):
+    return SimpleAgent(call=call, key=key)
+
+# Live interned agents, an entry goes away with the last reference to its agent
+_interned = weakref.WeakValueDictionary()
+_interned_lock = threading.Lock()
+
+def ai_agent(template, llm: str = None, tools: list = None, key: str = None, parallel_tools: bool = False,
+             intern: bool = False):
+    """intern=True returns the live agent built from the same template object and settings,
+    it shares that agent's session and therefore its conversation history."""
+    if not intern:
+        return LlmAgent(template=template, llm=llm, tools=tools, key=key, parallel_tools=parallel_tools)
+
+    signature = (template, llm, tuple(tools or ()), key, parallel_tools)
+    with _interned_lock:
+        agent = _interned.get(signature)
+        if agent is None:
+            agent = LlmAgent(template=template, llm=llm, tools=tools, key=key, parallel_tools=parallel_tools)
+            _interned[signature] = agent
+        return agent
 
 def test_ai_agent():
     def template_func(x):
@@ -0,0 +1,33 @@
+from auxiliary import renderer, llm_test
+from backends.google_adk import get_backend, MODEL_GPT_4O
+from operators.agent import Agent
+
+class BatchAgent(Agent):
+    __slots__ = ('_template', '_render', '_max_concurrency', 'agent', 'runner')
+
+    def __init__(self, template, llm: str = None, tools=None, key: str = None, max_concurrency: int = None):
+        super().__init__(key=key)
+        self._template = template
+        self._render = renderer(template)
+        self._max_concurrency = max_concurrency
+
+        if llm is None:
+            llm = MODEL_GPT_4O
+
+        if tools is None:
+            tools = []
+
+        self.agent, self.runner, _ = get_backend().create_runner(llm, tools)
+
+    def __call__(self, *args, **kwargs) -> list[str]:
+        prompts = self._render(**kwargs)
+        if isinstance(prompts, str):  # A plain template is one prompt, not one per character
+            prompts = [prompts]
+        return get_backend().call_agent_batch(list(prompts), self.runner, self._max_concurrency)
+
+def ai_batch(template, llm: str = None, tools: list = None, key: str = None, max_concurrency: int = None):
+    """All prompts produced by the template share one runner and are sent concurrently."""
+    return BatchAgent(template=template, llm=llm, tools=tools, key=key, max_concurrency=max_concurrency)
+
+def test_ai_batch():
+    llm_test(ai_batch(template=lambda x: [f"Name a {x} in one word", f"Name a {x} color in one word"]), x="fruit")
@@ -1,60 +1,175 @@
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
+from auxiliary import accepted_keys, bind_keys, renderer
 from operators.agent import Agent, simple_agent
+from operators.target import coalesced
 
 class Storage:
-    def __init__(self):
-        self._storage = None
+    """Keyed in-memory store, evicts the least recently used entry past maxsize."""
+    __slots__ = ('_entries', '_maxsize', '_ttl')
 
-    def get(self):
-        return self._storage
+    def __init__(self, maxsize: int = 128, ttl: float = None):
+        self._entries = OrderedDict()  # key -> (value, stored at)
+        self._maxsize = maxsize
+        self._ttl = ttl  # Seconds, None: never expires
 
-    def set(self, value):
-        self._storage = value
+    def get(self, key=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, stored_at = entry
+        if self._ttl is not None and time.monotonic() - stored_at >= self._ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
 
     def clear(self):
-        self._storage = None
+        self._entries.clear()
 
-    def is_empty(self):
-        return self._storage is None
+    def is_empty(self, key=None):
+        return self.get(key) is None
 
 class FileStorage(Storage):
+    """Single value backed by a file, the key is ignored."""
+    __slots__ = ('_filename',)
+
     def __init__(self, filename: str):
-        super().__init__()
+        super().__init__(maxsize=1)
         self._filename = filename
 
-    def get(self):
-        with open(self._filename, 'r') as f:
-            return f.read()
+    def get(self, key=None):
+        value = super().get()
+        if value is None and os.path.exists(self._filename):  # Hit the disk once, then serve from memory
+            with open(self._filename, 'r') as f:
+                value = f.read()
+            super().set(None, value)
+        return value
 
-    def set(self, value):
+    def set(self, key, value):
         with open(self._filename, 'w') as f:
             f.write(value)
+        super().set(None, value)
 
     def clear(self):
+        super().clear()
         if os.path.exists(self._filename):
             os.remove(self._filename)
 
-    def is_empty(self):
-        return not os.path.exists(self._filename)
-
 class Cache(Agent):
-    def __init__(self, key, agent: Agent, storage: Storage):
+    __slots__ = ('_storage', '_agent', '_version', '_version_keys', '_version_of', '_lock')
+
+    def __init__(self, key, agent: Agent, storage: Storage, version=None):
         super().__init__(key=key)
         self._storage = storage
         self._agent = agent
+        self._version = version  # Entries are stored per version
+        self._version_keys = accepted_keys(version)
+        self._version_of = bind_keys(version) if version is not None else None
+        self._lock = threading.Lock()  # Guards the storage only, never held across the agent call
+
+    def clear(self):
+        with self._lock:
+            self._storage.clear()
+
+    @property
+    def requires(self):
+        agent = self._agent.requires
+        if agent is None or 'kwargs' in self._version_keys:
+            return None
+        return agent | self._version_keys
+
+    def __call__(self, *args, **kwargs):
+        version = None
+        if self._version is not None:
+            version = self._version_of(**kwargs)
+
+        with self._lock:
+            value = self._storage.get(version)
+        if value is None:
+            # Concurrent callers of one version (e.g. parallel branches sharing this cache)
+            # wait for the first one, other versions are produced independently
+            value = coalesced((id(self), version), lambda: self._produce(version, args, kwargs))
+        return value
+
+    def _produce(self, version, args, kwargs):
+        with self._lock:
+            value = self._storage.get(version)  # Stored by a caller that finished in the meantime
+        if value is None:
+            value = self._agent(*args, **kwargs)
+            with self._lock:
+                self._storage.set(version, value)
+        return value
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+def openai_embedder(text: str) -> list[float]:
+    import litellm
+    return litellm.embedding(model=EMBEDDING_MODEL, input=[text]).data[0]['embedding']
+
+class SemanticCache(Agent):
+    __slots__ = ('_np', '_agent', '_template', '_render', '_embedder', '_threshold',
+                 '_embeddings', '_results', '_lock')
+
+    def __init__(self, key, agent: Agent, template, embedder, threshold: float):
+        super().__init__(key=key)
+        import numpy as np  # Only needed by this cache, keep the package import light
+        self._np = np
+        self._agent = agent
+        self._template = template
+        self._render = renderer(template)
+        self._embedder = embedder
+        self._threshold = threshold
+        self._embeddings = None  # (N, D) float32, rows are unit length
+        self._results = []
+        self._lock = threading.Lock()
 
     def clear(self):
-        self._storage.clear()
+        with self._lock:
+            self._embeddings = None
+            self._results = []
 
     def __call__(self, *args, **kwargs):
-        if self._storage.is_empty():
-            self._storage.set(self._agent(*args, **kwargs))
+        text = self._render(**kwargs)
 
-        return self._storage.get()
+        query = self._np.asarray(self._embedder(text), dtype=self._np.float32)
+        query = query / (self._np.linalg.norm(query) or 1.0)  # asarray may return the embedder's own array
 
-def cache(agent: Agent, key: str = None) -> Cache:
-    return Cache(agent=agent, key=key, storage=Storage())
+        with self._lock:
+            if self._embeddings is not None:
+                similarities = self._embeddings @ query  # Cosine, rows are normalized
+                best = int(similarities.argmax())
+                if similarities[best] >= self._threshold:
+                    return self._results[best]
+
+        result = self._agent(*args, **kwargs)
+
+        with self._lock:
+            rows = query[None, :]
+            self._embeddings = rows if self._embeddings is None else self._np.vstack([self._embeddings, rows])
+            self._results.append(result)
+
+        return result
+
+def semantic_cache(agent: Agent, template, embedder=openai_embedder,
+                   threshold: float = 0.92, key: str = None) -> SemanticCache:
+    """Reuses a stored result when the rendered template is close enough to an earlier one."""
+    return SemanticCache(key=key, agent=agent, template=template, embedder=embedder, threshold=threshold)
+
+def cache(agent: Agent, key: str = None, version=None, maxsize: int = 128, ttl: float = None) -> Cache:
+    return Cache(agent=agent, key=key, storage=Storage(maxsize=maxsize, ttl=ttl), version=version)
 
 def store(agent: Agent, filename: str, key: str = None) -> Cache:
     return Cache(agent=agent, key=key, storage=FileStorage(filename=filename))
@@ -64,6 +179,73 @@ def test_cache():
     assert c(a=1) == "test", "Cache should return the cached value on first call"
     assert c(a=2) == "test", "Cache should return the same value on subsequent calls"
 
+def test_cache_version():
+    calls = []
+    c = cache(agent=simple_agent(lambda turn: calls.append(turn) or f"turn {turn}"),
+              version=lambda turn: turn)
+    assert c(turn=0) == "turn 0"
+    assert c(turn=0) == "turn 0", "Same version should hit the cache"
+    assert c(turn=1) == "turn 1", "New version should refresh the cache"
+    assert calls == [0, 1]
+
+def test_cache_eviction():
+    calls = []
+    c = cache(agent=simple_agent(lambda turn: calls.append(turn) or f"turn {turn}"),
+              version=lambda turn: turn, maxsize=2)
+    for turn in (0, 1, 0, 2):
+        c(turn=turn)
+    assert calls == [0, 1, 2], "Recently used versions should stay cached"
+    assert c(turn=1) == "turn 1" and calls == [0, 1, 2, 1], "Least recently used version should be evicted"
+
+    c = cache(agent=simple_agent(lambda: calls.append(None) or "test"), ttl=0)
+    c()
+    c()
+    assert calls[-2:] == [None, None], "Expired entries should be recomputed"
+
+def test_cache_single_flight():
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return "test"
+
+    c = cache(agent=simple_agent(slow))
+    with ThreadPoolExecutor() as executor:
+        results = list(executor.map(lambda _: c(), range(4)))
+
+    assert results == ["test"] * 4
+    assert len(calls) == 1, "Concurrent callers should share a single computation"
+
+    def slow_turn(turn):
+        time.sleep(0.2)
+        return f"turn {turn}"
+
+    c = cache(agent=simple_agent(slow_turn), version=lambda turn: turn)
+    started = time.monotonic()
+    with ThreadPoolExecutor() as executor:
+        results = list(executor.map(lambda turn: c(turn=turn), range(4)))
+
+    assert results == [f"turn {turn}" for turn in range(4)]
+    assert time.monotonic() - started < 0.6, "Distinct versions should not wait for each other"
+
+def test_semantic_cache():
+    def letters(text):
+        return [text.lower().count(c) for c in "abcdefghijklmnopqrstuvwxyz"]
+
+    c = semantic_cache(agent=simple_agent(lambda question: f"Answer to {question}"),
+                       template=lambda question: question, embedder=letters, threshold=0.99)
+    assert c(question="Who wrote Doom?") == "Answer to Who wrote Doom?"
+    assert c(question="who wrote doom") == "Answer to Who wrote Doom?", "Near duplicate should hit"
+    assert c(question="What is BSP?") == "Answer to What is BSP?", "Different question should miss"
+
+    import numpy as np
+    vector = np.array([3.0, 4.0], dtype=np.float32)
+    c = semantic_cache(agent=simple_agent("test"), template=lambda question: question,
+                       embedder=lambda text: vector)
+    c(question="Who wrote Doom?")
+    assert vector.tolist() == [3.0, 4.0], "The embedder's array should not be normalized in place"
+
 def test_store():
     filename = "test_cache.txt"
     if os.path.exists(filename):
@@ -1,48 +1,83 @@
+import asyncio
+import random
 import time
 
 from operators.agent import Agent, simple_agent
 
-def catch(agent: Agent, exception: Agent):
-    class Catch(Agent):
-        def __call__(self, *args, **kwargs):
+class Catch(Agent):
+    __slots__ = ('_agent', '_exception')
+
+    def __init__(self, agent: Agent, exception: Agent):
+        super().__init__()
+        self._agent = agent
+        self._exception = exception
+
+    def __call__(self, *args, **kwargs):
+        try:
+            return self._agent(*args, **kwargs)
+        except Exception as e:
+            return self._exception(*args, **kwargs, error=e)
+
+    @property
+    def key(self):
+        return self._agent.key
+
+    @property
+    def requires(self):
+        agent, exception = self._agent.requires, self._exception.requires
+        if agent is None or exception is None:
+            return None
+        return agent | (exception - {'error'})
+
+class Retry(Agent):
+    __slots__ = ('_agent', 'timeout_millis', 'timeout_mult', 'max_retry', 'jitter_millis')
+
+    def __init__(self, agent: Agent, timeout_millis: int, timeout_mult: int, max_retry: int, jitter_millis: int):
+        super().__init__()
+        self._agent = agent
+        self.timeout_millis = timeout_millis
+        self.timeout_mult = timeout_mult
+        self.max_retry = max_retry
+        self.jitter_millis = jitter_millis
+
+    def delay(self, attempt: int) -> float:
+        # Exponential backoff, the jitter keeps concurrent retries from lining up
+        timeout = self.timeout_millis * self.timeout_mult ** attempt
+        return (timeout + random.uniform(0, self.jitter_millis)) / 1000.0
+
+    def __call__(self, *args, **kwargs):
+        for attempt in range(self.max_retry + 1):
+            try:
+                return self._agent(*args, **kwargs)
+            except Exception:
+                if attempt == self.max_retry:
+                    raise
+                time.sleep(self.delay(attempt))
+
+    async def acall(self, *args, **kwargs):
+        for attempt in range(self.max_retry + 1):
             try:
-                return agent(*args, **kwargs)
-            except Exception as e:
-                return exception(*args, **kwargs, error=e)
-
-        @property
-        def key(self):
-            return agent.key
-
-    return Catch()
-
-def retry(agent: Agent, timeout_millis: int = 1000, timeout_mult: int = 1, max_retry: int = 3):
-    class Retry(Agent):
-        def __init__(self):
-            super().__init__()
-            self.timeout_millis = timeout_millis
-            self.timeout_mult = timeout_mult
-            self.max_retry = max_retry
-            self.iteration = 0
-
-        def __call__(self, *args, **kwargs):
-            while True:
-                try:
-                    return agent(*args, **kwargs)
-                except Exception as e:
-                    timeout = self.timeout_millis * self.timeout_mult * self.iteration
-                    seconds = timeout / 1000.0
-                    time.sleep(seconds)
-
-                    self.iteration += 1
-                    if self.iteration > self.max_retry:
-                        raise e
-
-        @property
-        def key(self):
-            return agent.key
-
-    return Retry()
+                return await self._agent.acall(*args, **kwargs)
+            except Exception:
+                if attempt == self.max_retry:
+                    raise
+                await asyncio.sleep(self.delay(attempt))
+
+    @property
+    def key(self):
+        return self._agent.key
+
+    @property
+    def requires(self):
+        return self._agent.requires
+
+def catch(agent: Agent, exception: Agent):
+    return Catch(agent=agent, exception=exception)
+
+def retry(agent: Agent, timeout_millis: int = 1000, timeout_mult: int = 2, max_retry: int = 3,
+          jitter_millis: int = 100):
+    return Retry(agent=agent, timeout_millis=timeout_millis, timeout_mult=timeout_mult,
+                 max_retry=max_retry, jitter_millis=jitter_millis)
 
 def test_catch():
     def agent_func():
@@ -57,3 +92,19 @@ def test_catch():
 
     assert "Handled error!" in result, "Catch should handle the error and return the handled value"
 
+
+def test_retry():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ValueError("Not yet")
+        return "Done"
+
+    agent = retry(simple_agent(call=flaky), timeout_millis=1, jitter_millis=1)
+    assert agent() == "Done", "Retry should return once the agent succeeds"
+    assert len(attempts) == 3
+
+    attempts.clear()
+    assert agent() == "Done", "Each call should get the full retry budget"
@@ -1,39 +1,55 @@
+from collections import deque
+
 import operators as fai
 from prompts import PromptBuilder
 
-def ai_chat(agent: fai.Agent,
-            output_llm: callable = print,
-            input_user: callable = input,
-            key: str = None,
-            stop_word: str = '!done',
-            max_iter: int = 100) -> fai.Agent:
+class Chat(fai.Agent):
+    __slots__ = ('agent', 'output_llm', 'input_user', 'stop_word', 'max_iter', 'max_history')
 
-    class Chat(fai.Agent):
-        def __init__(self):
-            super().__init__(key=key)
-            self.agent = agent
-            self.stop_word = stop_word
-            self.max_iter = max_iter
+    def __init__(self, agent: fai.Agent, output_llm: callable, input_user: callable,
+                 key: str = None, stop_word: str = '!done', max_iter: int = 100, max_history: int = None):
+        super().__init__(key=key)
+        self.agent = agent
+        self.output_llm = output_llm
+        self.input_user = input_user
+        self.stop_word = stop_word
+        self.max_iter = max_iter
+        # Rounded up to whole LLM/User pairs so the window always starts with an LLM message
+        self.max_history = max_history + max_history % 2 if max_history else None
 
-        def __call__(self, *args, **kwargs) -> list[str]:
-            chat_history = []
-            for _ in range(self.max_iter):
-                question = self.agent(chat_history=chat_history, **kwargs)
-                chat_history.append(question)
-                output_llm(question)
+    def __call__(self, *args, **kwargs) -> list[str]:
+        chat_history = []
+        # The agent only sees the most recent messages, the full transcript is still returned
+        window = deque(maxlen=self.max_history) if self.max_history else chat_history
+        for _ in range(self.max_iter):
+            question = self.agent(chat_history=window, **kwargs)
+            chat_history.append(question)
+            if window is not chat_history:
+                window.append(question)
+            self.output_llm(question)
 
-                if self.stop_word in question:
-                    break
+            if self.stop_word in question:
+                break
 
-                reply = input_user()
-                chat_history.append(reply)
+            reply = self.input_user()
+            chat_history.append(reply)
+            if window is not chat_history:
+                window.append(reply)
 
-                if self.stop_word in reply:
-                    break
+            if self.stop_word in reply:
+                break
 
-            return chat_history
+        return chat_history
 
-    return Chat()
+def ai_chat(agent: fai.Agent,
+            output_llm: callable = print,
+            input_user: callable = input,
+            key: str = None,
+            stop_word: str = '!done',
+            max_iter: int = 100,
+            max_history: int = None) -> fai.Agent:
+    return Chat(agent=agent, output_llm=output_llm, input_user=input_user,
+                key=key, stop_word=stop_word, max_iter=max_iter, max_history=max_history)
 
 def test_ai_chat():
     chat_agent = ai_chat(
@@ -50,3 +66,15 @@ def test_ai_chat():
     )
     chat = chat_agent()
     assert len(chat) == 2
+
+def test_ai_chat_max_history():
+    seen = []
+    chat_agent = ai_chat(
+        agent=fai.simple_agent(lambda chat_history: seen.append(len(chat_history)) or "Question"),
+        output_llm=lambda question: None,
+        input_user=lambda: "Reply",
+        max_iter=4,
+        max_history=3)
+    chat = chat_agent()
+    assert seen == [0, 2, 4, 4], "The agent should only see the most recent messages"
+    assert len(chat) == 8, "The full transcript should be returned"
@@ -1,15 +1,16 @@
-from auxiliary import accepted_keys, safe_lambda
+from auxiliary import renderer
 from operators.target import Target
 
+class Dummy(Target):
+    __slots__ = ('call', '_render')
+
+    def __init__(self, template, key: str = None):
+        super().__init__(key=key)
+        self.call = template
+        self._render = renderer(template)
+
+    def __call__(self, *args, **kwargs):
+        return self._render(*args, **kwargs)
+
 def dummy(template, key=None):
-    class Dummy(Target):
-        def __init__(self):
-            super().__init__(key=key)
-            self.call = template
-            self.call_keys = accepted_keys(template)
-
-        def __call__(self, *args, **kwargs):
-            if callable(self.call):
-                return safe_lambda(self.call, self.call_keys, *args, **kwargs)
-            return template
-    return Dummy()
+    return Dummy(template=template, key=key)
@@ -1,37 +1,56 @@
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from pydantic import BaseModel
-from trustcall import create_extractor
+import functools
+from typing import TYPE_CHECKING
 
-from auxiliary import safe_lambda, accepted_keys, llm_test
+from auxiliary import llm_test, renderer
 from operators.agent import Agent, simple_agent
 
-def extract(template, agent: Agent, schema: type[BaseModel], key: str = None):
-    class Extract(Agent):
-        def __init__(self):
-            super().__init__(key=key)
-            self.template = template
-            self.accepted_keys = accepted_keys(template)
-            self.schema = schema
-            self.agent = agent
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from pydantic import BaseModel
 
-        def __call__(self, *args, **kwargs):
-            result = agent(*args, **kwargs)
+EXTRACT_MODEL = "gpt-4o"
 
-            prompt = self.template
-            if callable(self.template):
-                kwargs[self.agent.key] = result
-                prompt = safe_lambda(self.template, self.accepted_keys, **kwargs)
+# LangChain and trustcall are imported on first extraction, importing operators stays light
 
-            llm = ChatOpenAI(model="gpt-4o")
-            extractor = create_extractor(llm, tools=[self.schema])
-            prompt_template = ChatPromptTemplate([('system', prompt)])
-            result = extractor.invoke(prompt_template.format())
-            return result["responses"][0]
+@functools.cache
+def get_llm() -> 'ChatOpenAI':
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=EXTRACT_MODEL)  # One HTTP client for all extractions
 
-    return Extract()
+@functools.lru_cache(maxsize=32)
+def get_extractor(schema: 'type[BaseModel]'):
+    from trustcall import create_extractor
+    return create_extractor(get_llm(), tools=[schema])
+
+class Extract(Agent):
+    __slots__ = ('template', '_render', 'schema', 'agent')
+
+    def __init__(self, template, agent: Agent, schema: 'type[BaseModel]', key: str = None):
+        super().__init__(key=key)
+        self.template = template
+        self._render = renderer(template)
+        self.schema = schema
+        self.agent = agent
+
+    def __call__(self, *args, **kwargs):
+        from langchain_core.prompts import ChatPromptTemplate
+
+        result = self.agent(*args, **kwargs)
+
+        kwargs[self.agent.key] = result
+        prompt = self._render(**kwargs)
+
+        extractor = get_extractor(self.schema)
+        prompt_template = ChatPromptTemplate([('system', prompt)])
+        result = extractor.invoke(prompt_template.format())
+        return result["responses"][0]
+
+def extract(template, agent: Agent, schema: 'type[BaseModel]', key: str = None):
+    return Extract(template=template, agent=agent, schema=schema, key=key)
 
 def test_extract():
+    from pydantic import BaseModel
+
     class Extract(BaseModel):
         boolean: bool
 
@@ -1,26 +1,45 @@
+import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+from auxiliary import submit
 from operators.agent import Agent, simple_agent
 
-def fork(agent: Agent, mapper, reducer, key: str = None) -> Agent:
-    class Fork(Agent):
-        def __init__(self):
-            super().__init__(key=key)
-            self._agent = agent
-            self._mapper = mapper
-            self._reducer = reducer
+class Fork(Agent):
+    __slots__ = ('_agent', '_mapper', '_reducer', '_max_concurrency')
 
-        def __call__(self, *args, **kwargs):
-            result = {self._agent.key: self._agent(*args, **kwargs)}
-            agents = mapper(**result)
+    def __init__(self, agent: Agent, mapper, reducer, key: str = None, max_concurrency: int = None):
+        super().__init__(key=key)
+        self._agent = agent
+        self._mapper = mapper
+        self._reducer = reducer
+        self._max_concurrency = max_concurrency  # None: executor default
 
-            with ThreadPoolExecutor() as executor:
-                results = [executor.submit(trg, *args, **kwargs) for trg in agents]
-                results = [f.result() for f in results]
+    def __call__(self, *args, **kwargs):
+        result = {self._agent.key: self._agent(*args, **kwargs)}
+        agents = self._mapper(**result)  # Any iterable, consumed as the agents are submitted
 
-            return self._reducer(results)
+        with ThreadPoolExecutor(max_workers=self._max_concurrency) as executor:
+            results = [submit(executor, trg, *args, **kwargs) for trg in agents]
+            results = [f.result() for f in results]
 
-    return Fork()
+        return self._reducer(results)
+
+    async def acall(self, *args, **kwargs):
+        result = {self._agent.key: await self._agent.acall(*args, **kwargs)}
+        # Building agents may create backend sessions, keep that off the loop
+        agents = await asyncio.to_thread(lambda: list(self._mapper(**result)))
+
+        semaphore = asyncio.Semaphore(self._max_concurrency or len(agents) or 1)
+
+        async def bounded(trg):
+            async with semaphore:
+                return await trg.acall(*args, **kwargs)
+
+        results = await asyncio.gather(*(bounded(trg) for trg in agents))
+        return await asyncio.to_thread(self._reducer, list(results))
+
+def fork(agent: Agent, mapper, reducer, key: str = None, max_concurrency: int = None) -> Agent:
+    return Fork(agent=agent, mapper=mapper, reducer=reducer, key=key, max_concurrency=max_concurrency)
 
 def test_fork():
     def example_mapper(dum):
@@ -38,3 +57,4 @@ def test_fork():
     )
 
     assert forked_agent() == "Mapped 1: Hello, World! | Mapped 2: Hello, World!"
+    assert asyncio.run(forked_agent.acall()) == "Mapped 1: Hello, World! | Mapped 2: Hello, World!"
@@ -1,26 +1,26 @@
-import inspect
+from concurrent.futures import ThreadPoolExecutor
 
-from auxiliary import safe_lambda
+from auxiliary import submit
 from backends.google_adk import get_backend
 from operators.target import LlmTarget, Target
 
-def join(template, targets: list[Target], llm: str = None, tools: list = None, key: str = None):
-    class Join(LlmTarget):
-        def __init__(self):
-            super().__init__(llm=llm, tools=tools, key=key)
-            self.template = template
-            self.targets = targets
-            self.accepted_keys = set(inspect.signature(template).parameters.keys()) \
-                if callable(self.template) else set()
+class Join(LlmTarget):
+    __slots__ = ('template', 'targets')
+
+    def __init__(self, template, targets: list[Target], llm: str = None, tools: list = None, key: str = None):
+        super().__init__(template=template, llm=llm, tools=tools, key=key)
+        self.template = template
+        self.targets = targets
 
-        def __call__(self, *args, **kwargs):
-            results = [target(*args, **kwargs) for target in targets]  # todo: parallel
+    def __call__(self, *args, **kwargs):
+        with ThreadPoolExecutor(max_workers=max(1, len(self.targets))) as executor:
+            results = [submit(executor, target, *args, **kwargs) for target in self.targets]
+            results = [f.result() for f in results]
 
-            prompt = self.template
-            if callable(self.template):
-                kwargs[self.targets[0].key] = results  # Assuming the first target's key is used for the results
-                prompt = safe_lambda(self.template, self.accepted_keys, *args, **kwargs)
+        kwargs[self.targets[0].key] = results  # Assuming the first target's key is used for the results
+        prompt = self._render(*args, **kwargs)
 
-            return get_backend().call_agent(prompt, self.runner)
+        return get_backend().call_agent(prompt, self.runner, self.session)
 
-    return Join()
+def join(template, targets: list[Target], llm: str = None, tools: list = None, key: str = None):
+    return Join(template=template, targets=targets, llm=llm, tools=tools, key=key)
@@ -1,29 +1,64 @@
+import sys
+
+from auxiliary import accepted_keys, bind_keys
+from operators import reducers
 from operators.agent import Agent, simple_agent
 
-def loop(agent: Agent, condition, reducer, key: str = None):
-    class Loop(Agent):
-        def __init__(self):
-            super().__init__(key=key)
-            self.agent = agent
-            self.condition = condition
-            self.reducer = reducer
+class Loop(Agent):
+    __slots__ = ('agent', 'condition', 'reducer', '_test', '_positional')
+
+    def __init__(self, agent: Agent, condition, reducer, key: str = None):
+        super().__init__(key=key)
+        self.agent = agent
+        self.condition = condition
+        self.reducer = reducer
+        # A condition of idx alone is called positionally, anything else gets its keys projected
+        self._positional = accepted_keys(condition) == {'idx'}
+        self._test = condition if self._positional else bind_keys(condition)
 
-        def __call__(self, *args, **kwargs):
-            results = []
+    def __call__(self, *args, **kwargs):
+        agent, test, positional = self.agent, self._test, self._positional
+        key = sys.intern(agent.key)
 
+        def results():
+            # One kwargs dict for the whole loop, idx and the result are updated in place
             index = 0
-            while condition(idx=index, **kwargs):
-                result = self.agent(*args, **kwargs, idx=index)
-                results.append(result)
-                kwargs[agent.key] = result
+            while True:
+                kwargs['idx'] = index
+                if not (test(index) if positional else test(**kwargs)):
+                    return
+                result = agent(*args, **kwargs)
+                yield result
+                kwargs[key] = result
                 index += 1
 
-            return self.reducer(results)
+        # Iterations run as the reducer consumes them, so it can stop the loop early
+        return self.reducer(results())
+
+class LoopN(Loop):
+    __slots__ = ('count',)
+
+    def __init__(self, agent: Agent, count: int, reducer, key: str = None):
+        super().__init__(agent=agent, condition=lambda idx: idx < count, reducer=reducer, key=key)
+        self.count = count
 
-    return Loop()
+    def __call__(self, *args, **kwargs):
+        agent, key = self.agent, sys.intern(self.agent.key)
+
+        def results():
+            for index in range(self.count):  # No condition call per iteration
+                kwargs['idx'] = index
+                result = agent(*args, **kwargs)
+                yield result
+                kwargs[key] = result
+
+        return self.reducer(results())
+
+def loop(agent: Agent, condition, reducer, key: str = None):
+    return Loop(agent=agent, condition=condition, reducer=reducer, key=key)
 
-def loopn(agent: Agent, count, key: str = None):
-    return loop(agent, lambda idx: idx < count, key)
+def loopn(agent: Agent, count: int, key: str = None, reducer=reducers.last):
+    return LoopN(agent=agent, count=count, reducer=reducer, key=key)
 
 def test_loop():
     def agent_func(idx):
@@ -41,3 +76,22 @@ def test_loop():
     result = loop_agent()
     assert result == "Iteration 0 | Iteration 1 | Iteration 2 | Iteration 3 | Iteration 4", \
         "Loop should iterate 5 times and return the correct results"
+
+def test_loop_early_exit():
+    calls = []
+
+    def agent_func(idx):
+        calls.append(idx)
+        return idx if idx >= 2 else None
+
+    loop_agent = loop(
+        agent=simple_agent(call=agent_func),
+        condition=lambda idx, **kwargs: idx < 100,
+        reducer=reducers.first_success())
+
+    assert loop_agent() == 2
+    assert calls == [0, 1, 2], "Loop should stop once the reducer has its result"
+
+def test_loopn():
+    loop_agent = loopn(agent=simple_agent(call=lambda idx, it: f"{it or ''}{idx}"), count=3)
+    assert loop_agent() == "012", "Each iteration should see the previous result, the last one is returned"
@@ -1,36 +1,133 @@
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from auxiliary import safe_lambda, accepted_keys
+from auxiliary import bind_keys, submit
 from operators.agent import ai_agent
 from operators.agent import Agent, simple_agent
+from operators.reducers import Fold, concat
 
-def parallel(agents: list[Agent], reducer, key: str = None):
-    class Parallel(Agent):
-        def __init__(self):
-            super().__init__(key=key)
-            self.agents = agents
-            self.reducer = reducer
+# Set inside pooled branches and carried by every operator that hands work to its own threads
+_pooled = contextvars.ContextVar('fai_pooled', default=False)
 
-            if reducer is not None:
-                self.reducer_keys = accepted_keys(self.reducer)
+def _pooled_call(agent, *args, **kwargs):
+    _pooled.set(True)  # Runs in a copied context, the caller's is untouched
+    return agent(*args, **kwargs)
 
-        def __call__(self, *args, **kwargs):
-            with ThreadPoolExecutor() as executor:
-                results = [executor.submit(agent, *args, **kwargs) for agent in agents]
-                results = [f.result() for f in results]
-                results = {agent.key: result for agent, result in zip(self.agents, results)}
+# Shared by every parallel call, threads are reused instead of spawned and joined per fan-out
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv('FAI_POOL_SIZE', 32)), thread_name_prefix='fai')
 
-            if reducer is not None:
-                return safe_lambda(self.reducer, self.reducer_keys, **kwargs, **results)
-            else:
-                return None
+class Arrivals:
+    """Results in the order they arrive: fed to a Fold reducer, kept for the stop predicate."""
+    __slots__ = ('fold', 'stop', 'results', 'accumulator')
 
-    return Parallel()
+    def __init__(self, fold: Fold, stop):
+        self.fold = fold
+        self.stop = stop
+        self.results = {}
+        self.accumulator = fold.initial() if fold is not None else None
 
-def ai_parallel(template, agents: list[Agent], llm: str = None, tools: list = None, key: str = None):
+    def add(self, key, value) -> bool:
+        if self.fold is not None:
+            self.accumulator = self.fold.step(self.accumulator, key, value)
+            if self.stop is None:  # Nothing else needs the value, do not hold on to it
+                return False
+        self.results[key] = value
+        return self.stop is not None and self.stop(self.results)
+
+class Parallel(Agent):
+    __slots__ = ('agents', 'reducer', '_reduce', 'max_concurrency', '_keys', 'stop')
+
+    def __init__(self, agents: list[Agent], reducer, key: str = None, max_concurrency: int = None, stop=None):
+        super().__init__(key=key)
+        self.agents = agents
+        self._keys = [agent.key for agent in agents]  # Keys can be properties, look them up once
+        self.reducer = reducer
+        # One worker per branch: every request is in flight at the same time,
+        # so batching servers (vLLM, provider-side) can schedule them together
+        self.max_concurrency = max_concurrency or max(1, len(agents))
+        # Called with the results so far as they arrive, True cancels the branches still pending
+        self.stop = stop
+
+        if reducer is not None and not isinstance(reducer, Fold):
+            self._reduce = bind_keys(self.reducer)
+
+    @property
+    def _streaming(self) -> bool:
+        return self.stop is not None or isinstance(self.reducer, Fold)
+
+    def __call__(self, *args, **kwargs):
+        if _pooled.get() or self.max_concurrency < len(self.agents):
+            # Nested in a pooled branch, directly or through fork/sequential/join threads: waiting on
+            # the shared pool from inside it could deadlock, an explicit limit needs its own workers as well
+            executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+            try:
+                arrivals = self._collect(functools.partial(submit, executor), args, kwargs)
+            finally:  # After an early stop, do not wait for the branches still running
+                executor.shutdown(wait=self.stop is None, cancel_futures=True)
+        else:
+            arrivals = self._collect(functools.partial(submit, _POOL, _pooled_call), args, kwargs)
+
+        return self._reduced(arrivals, kwargs)
+
+    def _collect(self, submit, args, kwargs) -> Arrivals:
+        arrivals = Arrivals(self.reducer if isinstance(self.reducer, Fold) else None, self.stop)
+        futures = {submit(agent, *args, **kwargs): key for agent, key in zip(self.agents, self._keys)}
+        if not self._streaming:
+            arrivals.results = {key: future.result() for future, key in futures.items()}
+            return arrivals
+
+        for future in as_completed(futures):
+            if arrivals.add(futures[future], future.result()):
+                for pending in futures:
+                    pending.cancel()
+                break
+        return arrivals
+
+    async def acall(self, *args, **kwargs):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(agent):
+            async with semaphore:
+                return await agent.acall(*args, **kwargs)
+
+        arrivals = Arrivals(self.reducer if isinstance(self.reducer, Fold) else None, self.stop)
+        if not self._streaming:
+            results = await asyncio.gather(*(bounded(agent) for agent in self.agents))
+            arrivals.results = dict(zip(self._keys, results))
+        else:
+            tasks = {asyncio.ensure_future(bounded(agent)): key for agent, key in zip(self.agents, self._keys)}
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if any([arrivals.add(tasks[task], task.result()) for task in done]):
+                    for task in pending:
+                        task.cancel()
+                    break
+
+        return await asyncio.to_thread(self._reduced, arrivals, kwargs)
+
+    def _reduced(self, arrivals: Arrivals, kwargs):
+        if arrivals.fold is not None:
+            return arrivals.fold.result(arrivals.accumulator)
+        if self.reducer is not None:
+            kwargs.update(arrivals.results)  # Results shadow inputs, missing ones after a stop render as None
+            return self._reduce(**kwargs)
+        else:
+            return None
+
+def parallel(agents: list[Agent], reducer, key: str = None, max_concurrency: int = None, stop=None):
+    return Parallel(agents=agents, reducer=reducer, key=key, max_concurrency=max_concurrency, stop=stop)
+
+def ai_parallel(template, agents: list[Agent], llm: str = None, tools: list = None, key: str = None,
+                max_concurrency: int = None, stop=None):
     def reducer(**kwargs):
         return ai_agent(template, llm, tools)(**kwargs)
-    return parallel(agents, reducer, key)
+    return parallel(agents, reducer, key, max_concurrency, stop)
 
 def test_parallel():
     def reducer(one, two, three):
@@ -48,3 +145,67 @@ def test_parallel():
     result = join_agent()
     assert result == "One: One | Two: Two | Tree: Three", \
         f"Expected 'One: One | Two: Two | Tree: Three', got {result}"
+
+def test_parallel_nested():
+    inner = parallel(agents=[simple_agent("a", key="a"), simple_agent("b", key="b")],
+                     reducer=lambda a, b: a + b, key="ab")
+    outer = parallel(agents=[inner, simple_agent("c", key="c")], reducer=lambda ab, c: ab + c)
+
+    assert outer() == "abc"
+    assert asyncio.run(outer.acall()) == "abc"
+
+def test_parallel_nested_fork():
+    from operators.fork import fork
+
+    # As many branches as pool workers, all holding one before going deeper:
+    # a nested parallel queued on the pool would never run
+    count = _POOL._max_workers
+    started = threading.Barrier(count, timeout=5)
+
+    def hold(i):
+        started.wait()
+        return str(i)
+
+    def branch(i):
+        inner = parallel(agents=[simple_agent("x", key="x"), simple_agent("y", key="y")],
+                         reducer=lambda x, y: x + y)
+        return fork(agent=simple_agent(lambda: hold(i), key="i"), mapper=lambda i: [inner],
+                    reducer=lambda results: results[0], key=f"b{i}")
+
+    outer = parallel(agents=[branch(i) for i in range(count)], reducer=lambda **kwargs: len(kwargs))
+    results = []
+    worker = threading.Thread(target=lambda: results.append(outer()), daemon=True)
+    worker.start()
+    worker.join(timeout=10)
+    assert results == [count], "Parallel nested through fork should not wait on the shared pool"
+
+def test_parallel_stop():
+    def slow():
+        time.sleep(1)
+        return "slow"
+
+    vote = parallel(
+        agents=[simple_agent(call=slow, key="slow"), simple_agent(call="fast", key="fast")],
+        reducer=lambda slow, fast: f"{slow} {fast}",
+        stop=lambda results: "fast" in results)
+
+    started = time.monotonic()
+    assert vote() == "None fast", "Reducer should run without waiting for the slow branch"
+    assert time.monotonic() - started < 1
+
+    async def timed():
+        started = time.monotonic()
+        return await vote.acall(), time.monotonic() - started
+
+    result, elapsed = asyncio.run(timed())
+    assert result == "None fast" and elapsed < 1
+
+def test_parallel_fold():
+    def slow():
+        time.sleep(0.05)
+        return "slow"
+
+    joined = parallel(agents=[simple_agent(call=slow, key="slow"), simple_agent(call="fast", key="fast")],
+                      reducer=concat())
+    assert joined() == "fast | slow", "Fold reducers should see results in arrival order"
+    assert asyncio.run(joined.acall()) == "fast | slow"
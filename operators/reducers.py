@@ -0,0 +1,60 @@
+from collections import deque
+
+def first(results):
+    return next(iter(results), None)
+
+def last(results):
+    tail = deque(results, maxlen=1)  # Consumes everything, keeps only the latest
+    return tail[0] if tail else None
+
+def first_success(predicate=None):
+    """Reducer returning the first result passing the predicate (truthy by default), None otherwise."""
+    def reducer(results):
+        return next(filter(predicate, results), None)
+    return reducer
+
+class Fold:
+    """Streaming reducer: parallel and sequential feed it (key, value) pairs as results arrive
+    instead of collecting them first. State lives in the accumulator, so one Fold serves concurrent calls."""
+    __slots__ = ('initial', 'step', 'finish')
+
+    def __init__(self, initial, step, finish=None):
+        self.initial = initial  # () -> accumulator
+        self.step = step  # (accumulator, key, value) -> accumulator
+        self.finish = finish  # accumulator -> result
+
+    def __call__(self, pairs):
+        accumulator = self.initial()
+        for key, value in pairs:
+            accumulator = self.step(accumulator, key, value)
+        return self.result(accumulator)
+
+    def result(self, accumulator):
+        return self.finish(accumulator) if self.finish is not None else accumulator
+
+def fold(initial, step, finish=None) -> Fold:
+    return Fold(initial=initial, step=step, finish=finish)
+
+def concat(separator: str = ' | ') -> Fold:
+    """Joins results in arrival order, parallel does not wait for the slowest branch to start joining."""
+    def step(parts, key, value):
+        parts.append(value)
+        return parts
+    return fold(list, step, separator.join)
+
+def test_first():
+    assert first(iter(["a", "b"])) == "a"
+    assert first([]) is None
+
+def test_last():
+    assert last(iter(["a", "b"])) == "b"
+    assert last([]) is None
+
+def test_first_success():
+    assert first_success()([None, "", "ok", "later"]) == "ok"
+    assert first_success(lambda r: r > 1)([0, 1, 2, 3]) == 2
+    assert first_success()([]) is None
+
+def test_fold():
+    assert concat()([("one", "One"), ("two", "Two")]) == "One | Two"
+    assert fold(dict, lambda acc, key, value: {**acc, key: value})([("a", 1)]) == {"a": 1}
@@ -1,33 +1,108 @@
-from auxiliary import llm_test, accepted_keys, safe_lambda
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from auxiliary import llm_test, bind_keys, submit
 from operators.agent import ai_agent, simple_agent
 from operators.agent import Agent
+from operators.reducers import Fold, concat
+
+def level_numbers(agents: list[Agent]):
+    """Level of every agent, agents on one level can run concurrently. None if an agent's inputs are unknown."""
+    levels = []
+    for index, agent in enumerate(agents):
+        requires = agent.requires
+        if requires is None:
+            return None
+
+        level = 0
+        for prior in range(index):
+            prior_agent, prior_level = agents[prior], levels[prior]
+            if prior_agent.key in requires:  # Reads its result
+                level = max(level, prior_level + 1)
+            elif prior_agent.key == agent.key or agent.key in prior_agent.requires:
+                level = max(level, prior_level)  # Must not overwrite a result before it is used
+        levels.append(level)
+    return levels
+
+def repeated_calls(agents: list[Agent]):
+    """For every agent, the index of an earlier call it can reuse, None if it has to run.
+    Reuse needs the same agent object with inputs nobody has written since its first run."""
+    sources = []
+    for index, agent in enumerate(agents):
+        source = None
+        requires = agent.requires
+        if requires is not None and agent.key not in requires:
+            for prior in range(index - 1, -1, -1):
+                if agents[prior] is agent:
+                    source = prior if sources[prior] is None else sources[prior]
+                    break
+                if agents[prior].key in requires:
+                    break
+        sources.append(source)
+    return sources
+
+class Sequential(Agent):
+    __slots__ = ('agents', 'reducer', '_reduce', '_concurrent', '_steps')
+
+    def __init__(self, agents: list[Agent], reducer, key: str = None, concurrent: bool = False):
+        super().__init__(key=key)
+        self.agents = agents
+        self.reducer = reducer
+
+        if reducer is not None and not isinstance(reducer, Fold):
+            self._reduce = bind_keys(self.reducer)
 
-def sequential(agents: list[Agent], reducer, key: str = None):
-    class Sequential(Agent):
-        def __init__(self):
-            super().__init__(key=key)
-            self.agents = agents
-            self.reducer = reducer
+        assert len(self.agents) > 0, "Sequential operator requires at least one agent."
 
-            if reducer is not None:
-                self.reducer_keys = accepted_keys(self.reducer)
+        # Opt-in: agents that do not read each other's results run side by side. Off by default,
+        # sequential also orders agents whose tools share state outside the template keys
+        levels = level_numbers(agents) if concurrent else None
+        self._concurrent = levels is not None
 
-            assert len(self.agents) > 0, "Sequential operator requires at least one agent."
+        # (index, agent, key, reused index) per level, keys can be properties so they are looked up once
+        sources = repeated_calls(agents)
+        steps = [(index, agent, agent.key, source) for index, (agent, source) in enumerate(zip(agents, sources))]
+        if levels is None:
+            self._steps = [steps]
+        else:
+            self._steps = [[step for step in steps if levels[step[0]] == level] for level in range(max(levels) + 1)]
 
-        def __call__(self, *args, **kwargs):
-            results = {}
+    def __call__(self, *args, **kwargs):
+        memo = {}  # Index -> result, within this call only
+        fold = self.reducer if isinstance(self.reducer, Fold) else None
+        accumulator = fold.initial() if fold is not None else None
 
-            for agent in self.agents:
-                result = agent(*args, **kwargs)
-                kwargs[agent.key] = agent(*args, **kwargs)
-                results[agent.key] = result
+        for level in self._steps:
+            pending = [(index, agent) for index, agent, key, source in level if source is None]
+            if not self._concurrent or len(pending) <= 1:
+                # Serial: every agent sees the results of the ones before it
+                for index, agent, key, source in level:
+                    if source is None:
+                        memo[index] = agent(*args, **kwargs)
+                    kwargs[key] = memo[index if source is None else source]
+                    if fold is not None:  # Folded as soon as it is known
+                        accumulator = fold.step(accumulator, key, kwargs[key])
+                continue
 
-            if reducer is not None:
-                return safe_lambda(self.reducer, self.reducer_keys, **kwargs, **results)
-            else:
-                return None
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                futures = [(index, submit(executor, agent, *args, **kwargs)) for index, agent in pending]
+                memo.update((index, f.result()) for index, f in futures)
 
-    return Sequential()
+            for index, agent, key, source in level:  # In declaration order, later agents win on equal keys
+                kwargs[key] = memo[index if source is None else source]
+                if fold is not None:
+                    accumulator = fold.step(accumulator, key, kwargs[key])
+
+        if fold is not None:
+            return fold.result(accumulator)
+
+        if self.reducer is not None:  # Results are merged into kwargs under the agent keys
+            return self._reduce(**kwargs)
+        else:
+            return None
+
+def sequential(agents: list[Agent], reducer, key: str = None, concurrent: bool = False):
+    return Sequential(agents=agents, reducer=reducer, key=key, concurrent=concurrent)
 
 def test_sequential():
     def reducer(one, two, three):
@@ -41,6 +116,60 @@ def test_sequential():
 
     print(seq())
 
+def test_sequential_levels():
+    agents = [
+        simple_agent("One", key="one"),
+        simple_agent("Two", key="two"),
+        simple_agent(lambda one, two: f"{one} + {two}", key="three"),
+        simple_agent(lambda three: f"({three})", key="four")]
+    assert level_numbers(agents) == [0, 0, 1, 2]
+
+    seq = sequential(agents=agents, reducer=lambda four: four, concurrent=True)
+    assert seq() == "(One + Two)"
+
+    order = []
+    seq = sequential(agents=[
+        simple_agent(lambda: time.sleep(0.05) or order.append("load") or "Loaded", key="load"),
+        simple_agent(lambda: order.append("update") or "Updated", key="update")
+    ], reducer=lambda update: update)
+    assert seq() == "Updated"
+    assert order == ["load", "update"], "Without concurrent=True the declared order should hold"
+
+    assert level_numbers([simple_agent(lambda **kwargs: "One")]) is None, \
+        "Agents reading arbitrary kwargs should keep the serial order"
+
+def test_sequential_calls_once():
+    calls = []
+
+    seq = sequential(agents=[
+        simple_agent(lambda **kwargs: calls.append("one") or "One", key="one"),
+        simple_agent(lambda **kwargs: calls.append("two") or "Two", key="two")
+    ], reducer=lambda one, two: f"{one}, {two}")
+
+    assert seq() == "One, Two"
+    assert calls == ["one", "two"], "Each agent should be called exactly once"
+
+def test_sequential_repeated():
+    calls = []
+    one = simple_agent(lambda: calls.append("one") or "One", key="one")
+    two = simple_agent(lambda: calls.append("two") or "Two", key="two")
+    seq = sequential(agents=[one, two, one], reducer=lambda one, two: f"{one}, {two}")
+    assert seq() == "One, Two"
+    assert calls == ["one", "two"], "A repeated agent with unchanged inputs should run once"
+
+    calls.clear()
+    echo = simple_agent(lambda two: calls.append("echo") or f"Echo {two}", key="echo")
+    seq = sequential(agents=[echo, two, echo], reducer=lambda echo: echo)
+    assert seq(two="Input") == "Echo Two"
+    assert calls == ["echo", "two", "echo"], "Changed inputs should call the agent again"
+
+def test_sequential_fold():
+    seq = sequential(agents=[
+        simple_agent("One", key="one"),
+        simple_agent(lambda one: f"Two after {one}", key="two")
+    ], reducer=concat())
+    assert seq() == "One | Two after One"
+
 def test_sequential_2():
     inf = ai_agent(lambda one, two: f"Combine these two stories: {one} and {two}")
 
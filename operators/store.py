@@ -1,22 +1,91 @@
+import hashlib
+import mmap
 import os
+import tempfile
+import threading
 
+from operators.cache import Storage
 from operators.target import Target
 
-def store(target: Target, file: str = None, key: str = None) -> Target:
-    class Store(Target):
-        def __init__(self):
-            super().__init__(key=key)
-            self.cache_key = file
+MMAP_THRESHOLD = 1 << 20  # Larger entries are decoded straight from a read-only mapping
 
-        def __call__(self, *args, **kwargs):
-            if os.path.exists(self.cache_key):
-                with open(self.cache_key, 'r') as f:
-                    return f.read()
+def read_entry(path: str) -> str:
+    with open(path, 'rb') as f:  # Binary: no newline translation, one decode of the whole entry
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            return f.read().decode('utf-8')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, 'utf-8')
 
-            result = target(*args, **kwargs)
-            with open(self.cache_key, 'w') as f:
-                f.write(result)
+class Store(Target):
+    __slots__ = ('target', 'name', 'cache_dir', '_memory', '_lock')
 
+    def __init__(self, target: Target, name: str, cache_dir: str = '.fai_store', key: str = None,
+                 maxsize: int = 128):
+        super().__init__(key=key)
+        self.target = target
+        self.name = name  # Namespace inside the shared cache_dir, one per stored target
+        self.cache_dir = cache_dir
+        self._memory = Storage(maxsize=maxsize)  # Digest -> result, hot keys skip the disk
+        self._lock = threading.Lock()
+
+    def digest(self, *args, **kwargs) -> str:
+        # Every distinct input gets its own entry, inputs without a stable repr simply miss
+        fingerprint = repr((self.name, args, sorted(kwargs.items())))
+        return hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
+
+    def __call__(self, *args, **kwargs):
+        digest = self.digest(*args, **kwargs)
+        with self._lock:
+            result = self._memory.get(digest)
+        if result is not None:
             return result
 
-    return Store()
+        path = os.path.join(self.cache_dir, digest)
+        try:  # One open instead of exists + open, and no window for the file to vanish in between
+            result = read_entry(path)
+        except FileNotFoundError:
+            result = self.target(*args, **kwargs)
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir)  # Readers never see a partial file
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(result.encode('utf-8'))
+                os.replace(tmp, path)  # Atomic, concurrent writers of one digest just replace each other
+            except BaseException:
+                os.remove(tmp)
+                raise
+
+        with self._lock:
+            self._memory.set(digest, result)
+        return result
+
+def store(target: Target, name: str, cache_dir: str = '.fai_store', key: str = None, maxsize: int = 128) -> Target:
+    return Store(target=target, name=name, cache_dir=cache_dir, key=key, maxsize=maxsize)
+
+def test_store():
+    from operators.dummy import dummy
+
+    calls = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        def topic(x):
+            calls.append(x)
+            return f"a story about {x}"
+
+        s = store(dummy(topic), name="story", cache_dir=cache_dir)
+        assert s(x="a cat") == "a story about a cat"
+        assert s(x="a dog") == "a story about a dog", "Each input should get its own entry"
+
+        s = store(dummy(topic), name="story", cache_dir=cache_dir)
+        assert s(x="a cat") == "a story about a cat"
+        assert calls == ["a cat", "a dog"], "A stored input should be read back instead of recomputed"
+
+        joke = store(dummy("a joke"), name="joke", cache_dir=cache_dir)
+        poem = store(dummy("a poem"), name="poem", cache_dir=cache_dir)
+        assert joke() == "a joke"
+        assert poem() == "a poem", "Stores with different names should not share entries"
+
+        s = store(dummy(topic), name="story", cache_dir=cache_dir, maxsize=1)
+        assert s(x="a cat") == "a story about a cat" and s(x="a dog") == "a story about a dog"
+        assert len(s._memory._entries) == 1, "The in-memory layer should stay bounded"
+        assert s(x="a cat") == "a story about a cat" and len(calls) == 2, "Evicted entries are read from disk"
@@ -1,22 +1,41 @@
-from auxiliary import accepted_keys, safe_lambda
+import threading
+
+from auxiliary import bind_keys
 from operators.agent import Agent, simple_agent
 
-def switch(ifbranch: Agent, elsebranch: Agent, condition, key: str = None):
-    class Switch(Agent):
-        def __init__(self):
-            super().__init__(key=key)
-            self._ifbranch = ifbranch
-            self._elsebranch = elsebranch
-            self._condition = condition
-            self._condition_keys = accepted_keys(condition)
+class Switch(Agent):
+    __slots__ = ('_ifbranch', '_elsebranch', '_factories', '_condition', '_test', '_lock')
+
+    def __init__(self, ifbranch, elsebranch, condition, key: str = None,
+                 ifbranch_factory=None, elsebranch_factory=None):
+        super().__init__(key=key)
+        # A branch left as None is built by its zero-argument factory the first time it is taken
+        self._ifbranch = ifbranch
+        self._elsebranch = elsebranch
+        self._factories = {'_ifbranch': ifbranch_factory, '_elsebranch': elsebranch_factory}
+        self._condition = condition
+        self._test = bind_keys(condition)
+        self._lock = threading.Lock()
 
-        def __call__(self, *args, **kwargs):
-            if safe_lambda(self._condition, self._condition_keys, **kwargs):
-                return self._ifbranch(*args, **kwargs)
-            else:
-                return self._elsebranch(*args, **kwargs)
+    def _branch(self, name: str):
+        branch = getattr(self, name)
+        if branch is None:
+            with self._lock:
+                branch = getattr(self, name)
+                if branch is None:
+                    branch = self._factories[name]()
+                    setattr(self, name, branch)
+        return branch
 
-    return Switch()
+    def __call__(self, *args, **kwargs):
+        if self._test(**kwargs):
+            return self._branch('_ifbranch')(*args, **kwargs)
+        else:
+            return self._branch('_elsebranch')(*args, **kwargs)
+
+def switch(ifbranch, elsebranch, condition, key: str = None, ifbranch_factory=None, elsebranch_factory=None):
+    return Switch(ifbranch=ifbranch, elsebranch=elsebranch, condition=condition, key=key,
+                  ifbranch_factory=ifbranch_factory, elsebranch_factory=elsebranch_factory)
 
 def test_switch():
     if_branch = simple_agent(call="This is the if branch")
@@ -32,3 +51,25 @@ def test_switch():
     switch_false = switch(ifbranch=if_branch, elsebranch=else_branch, condition=condition_false)
     result_false = switch_false()
     assert result_false == "This is the else branch", f"Expected 'This is the else branch', got {result_false}"
+
+def test_switch_lazy():
+    built = []
+
+    def branch(name):
+        def factory():
+            built.append(name)
+            return simple_agent(call=f"This is the {name} branch")
+        return factory
+
+    lazy = switch(ifbranch=None, elsebranch=None, condition=lambda flag: flag,
+                  ifbranch_factory=branch("if"), elsebranch_factory=branch("else"))
+    assert lazy(flag=True) == "This is the if branch"
+    assert lazy(flag=True) == "This is the if branch"
+    assert built == ["if"], "Only the taken branch should be built, and only once"
+
+def test_switch_target():
+    from operators.dummy import dummy
+
+    branches = switch(ifbranch=dummy("IF"), elsebranch=lambda **kwargs: "ELSE", condition=lambda flag: flag)
+    assert branches(flag=True) == "IF", "Targets should be used as branches, not called as factories"
+    assert branches(flag=False) == "ELSE", "Plain callables should be used as branches"
@@ -1,7 +1,37 @@
-from auxiliary import accepted_keys, safe_lambda
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from auxiliary import renderer
 from backends.google_adk import MODEL_GPT_4O_MINI, get_backend
 
+# (runner, session, prompt) -> Future of the request already on the wire
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+def coalesced(key, call):
+    """Runs call() once for concurrent callers with the same key, the others wait for its result."""
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight[key] = Future()
+
+    if not owner:
+        return future.result()
+
+    try:
+        future.set_result(call())
+    except BaseException as e:
+        future.set_exception(e)
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+    return future.result()
+
 class Target:
+    __slots__ = ('_key',)
+
     def __init__(self, key: str = None):
         self._key = key
 
@@ -13,10 +43,12 @@ class Target:
         return self._key if self._key is not None else 'it'
 
 class LlmTarget(Target):
+    __slots__ = ('_template', '_render', 'agent', 'runner', 'session')
+
     def __init__(self, template, llm: str = None, tools=None, schema=None, key: str = None):
         super().__init__(key=key)
         self._template = template
-        self._template_keys = accepted_keys(template)
+        self._render = renderer(template)
 
         if llm is None:
             llm = MODEL_GPT_4O_MINI  # Default to GPT-4O Mini
@@ -24,12 +56,29 @@ class LlmTarget(Target):
         if tools is None:
             tools = []
 
-        self.agent, self.runner = get_backend().create_runner(llm, tools, schema)
+        # The runner comes from the backend's per (llm, tools, schema) cache, only the session is ours
+        self.agent, self.runner, self.session = get_backend().create_runner(llm, tools, schema)
 
     def __call__(self, *args, **kwargs):
-        prompt = self._template
+        prompt = self._render(*args, **kwargs)
+        # Only one exchange per session: identical concurrent calls share the answer, not the history
+        return coalesced((id(self.runner), self.session.id, prompt),
+                         lambda: get_backend().call_agent(prompt, self.runner, self.session))
+
+def test_coalesced():
+    def failing():
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    def call(_):
+        try:
+            return coalesced("key", failing)
+        except ValueError as e:
+            return e
 
-        if callable(self._template):
-            prompt = safe_lambda(self._template, self._template_keys, *args, **kwargs)
+    with ThreadPoolExecutor() as executor:
+        errors = list(executor.map(call, range(4)))
 
-        return get_backend().call_agent(prompt, self.runner)
+    assert all(isinstance(e, ValueError) for e in errors), "Every waiter should see the owner's exception"
+    assert not _in_flight, "The key should be released after a failure"
+    assert coalesced("key", lambda: "answer") == "answer", "A failed key should be callable again"
@@ -1,25 +1,27 @@
-from auxiliary import llm_test, accepted_keys, safe_lambda
+from auxiliary import llm_test, bind_keys
 from operators.agent import Agent, simple_agent, ai_agent
 
-def transform(agent: Agent, transformer, key: str = None):
-    class Transform(Agent):
-        def __init__(self):
-            super().__init__(key)
-            self.agent = agent
-            self.transformer = transformer
+class Transform(Agent):
+    __slots__ = ('agent', 'transformer', '_transform')
+
+    def __init__(self, agent: Agent, transformer, key: str = None):
+        super().__init__(key)
+        self.agent = agent
+        self.transformer = transformer
 
-            if transformer is not None:
-                self.transformer_keys = accepted_keys(self.transformer)
+        if transformer is not None:
+            self._transform = bind_keys(self.transformer)
 
-        def __call__(self, *args, **kwargs):
-            kwargs[agent.key] = agent(*args, **kwargs)
+    def __call__(self, *args, **kwargs):
+        kwargs[self.agent.key] = self.agent(*args, **kwargs)
 
-            if self.transformer is not None:
-                return safe_lambda(self.transformer, self.transformer_keys, **kwargs)
-            else:
-                return None
+        if self.transformer is not None:
+            return self._transform(**kwargs)
+        else:
+            return None
 
-    return Transform()
+def transform(agent: Agent, transformer, key: str = None):
+    return Transform(agent=agent, transformer=transformer, key=key)
 
 def ai_transform(template, agent: Agent, llm: str = None, tools: list = None, key: str = None):
     def transformer(**kwargs):
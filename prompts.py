@@ -1,3 +1,4 @@
+import copy
 import textwrap
 
 abc = "abcdefghijklmnopqrstvuwxyz"
@@ -10,6 +11,12 @@ class PromptBuilder:
         self.letter = 0
         self.tag_stack = []
 
+    def clone(self):
+        """Copy to extend a prebuilt prefix without touching the original."""
+        builder = copy.copy(self)
+        builder.tag_stack = list(self.tag_stack)
+        return builder
+
     @property
     def __indent(self):
         return '\t' * self.tabs
@@ -1,3 +1,4 @@
+import functools
 import os
 
 import operators as fai
@@ -24,26 +25,53 @@ def access_prompt(dir: str, file: str) -> str:
 def test_access_prompt():
     print_success_green(access_prompt('Cluely', "Default Prompt.txt"))
 
-def prompts_list() -> str:
+@functools.lru_cache(maxsize=1)
+def _prompts_listing(mtimes: tuple) -> str:
     result = "Available example prompts:\n"
-    dirs = os.listdir(prompts_dir)
-    for dir in dirs:
-        dir_full = os.path.join(prompts_dir, dir)
-        if '.git' in dir_full:
-            continue
-
-        if os.path.isdir(dir_full):
-            result += f"{dir}\n"
-            files = os.listdir(os.path.join(prompts_dir, dir))
-            for file in files:
-                result += f"- {file}\n"
+    with os.scandir(prompts_dir) as dirs:
+        for dir in dirs:
+            if '.git' in dir.name or not dir.is_dir():
+                continue
+
+            result += f"{dir.name}\n"
+            with os.scandir(dir.path) as files:
+                for file in files:
+                    result += f"- {file.name}\n"
     return result
 
+def _listing_mtimes() -> tuple:
+    # Adding a file to a prompt directory only changes that directory's mtime, not the top level one
+    with os.scandir(prompts_dir) as dirs:
+        subdirs = sorted((dir.name, dir.stat().st_mtime_ns) for dir in dirs
+                         if '.git' not in dir.name and dir.is_dir())
+    return os.stat(prompts_dir).st_mtime_ns, tuple(subdirs)
+
+def prompts_list() -> str:
+    # Walked again only when a directory in the listing has changed
+    return _prompts_listing(_listing_mtimes())
+
 def test_prompts_list():
     print_success_green(prompts_list())
 
-def interviewer_template(user_input: str, chat_history: list[str]) -> str:
-    return (PromptBuilder()
+def test_prompts_list_refresh():
+    import tempfile
+    global prompts_dir
+
+    saved = prompts_dir
+    with tempfile.TemporaryDirectory() as prompts_dir:
+        try:
+            os.mkdir(os.path.join(prompts_dir, 'A'))
+            open(os.path.join(prompts_dir, 'A', 'one.txt'), 'w').close()
+            assert '- one.txt' in prompts_list()
+
+            open(os.path.join(prompts_dir, 'A', 'two.txt'), 'w').close()
+            os.utime(os.path.join(prompts_dir, 'A'), ns=(0, 0))  # Distinct mtime even on coarse clocks
+            assert '- two.txt' in prompts_list(), "A file added to a subdirectory should show up"
+        finally:
+            prompts_dir = saved
+
+# Everything before the per-call inputs is built once, each call clones it and appends
+interviewer_prefix = (PromptBuilder()
      .text("You are Prompty, an agent who helps creating prompts.").dash()
      .text("The User will provide the topic of the prompt and a brief description.")
      .text("Your goal is to help to create the final prompt to the LLM").dash()
@@ -63,7 +91,11 @@ def interviewer_template(user_input: str, chat_history: list[str]) -> str:
      .num("The user will mention if they want to introduce corrections or move on to the next instruction")
      .num("Once the instruction is covered, move to the next instruction")
      .num("When all instructions are covered, print a single stop word: !done").dash()
-     .text("The topic and the brief description from the User:").text(user_input).dash()
+     .text("The topic and the brief description from the User:"))
+
+def interviewer_template(user_input: str, chat_history: list[str]) -> str:
+    return (interviewer_prefix.clone()
+     .text(user_input).dash()
      .chat(chat_history)
      .prompt)
 
@@ -72,7 +104,9 @@ def test_interviewer_template():
         user_input="Create a prompt for an AI assistant that helps users with their daily tasks.",
         chat_history=["What is the main role of the AI assistant?"]))
 
-def prompt_template(interview: str) -> str:
+@functools.lru_cache(maxsize=1)
+def prompt_prefix(listing: str) -> PromptBuilder:
+    # Built on first use: it reads static/example, keyed on the listing so new prompts rebuild it
     return (PromptBuilder()
     .text("You are Prompty, an agent who helps creating prompts.")
     .text("Based on the Interview with the User, create a final prompt to the LLM").dash()
@@ -84,9 +118,12 @@ def prompt_template(interview: str) -> str:
     .num("Use second-person imperative (or direct address) for the prompt: 'You are...', 'Your task is...'")
     .num("Include examples for each instruction in the prompt")
     .num("Print only the final prompt, nothing else").dash()
-    .text(prompts_list()).dash()
+    .text(listing).dash()
     .text("Example Final Prompt:").file("static/example").dash()
-    .text("Interview with the User:").nl()
+    .text("Interview with the User:").nl())
+
+def prompt_template(interview: str) -> str:
+    return (prompt_prefix(prompts_list()).clone()
     .tag_open("interview").text(interview).tag_close()
     .prompt)
 